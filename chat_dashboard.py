@@ -1,9 +1,13 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 from chat_parser import ChatParser
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+import codecs
+import glob
+import hashlib
 import os
 
 # Set page configuration with dark theme
@@ -111,7 +115,62 @@ def create_modern_chart_theme():
         )
     }
 
+@st.cache_data(show_spinner=False)
+def _parse_cached(chat_bytes: bytes) -> pd.DataFrame:
+    # Keyed on the raw file bytes, so widget interactions reuse the parsed
+    # DataFrame instead of re-running the regex parser on every rerun.
+    # Decoded in a single pass: a UTF-8 BOM is dropped if present and
+    # undecodable bytes are replaced rather than decoding again as latin1
+    encoding = 'utf-8-sig' if chat_bytes.startswith(codecs.BOM_UTF8) else 'utf-8'
+    chat_text = chat_bytes.decode(encoding, errors='replace')
+    parser = ChatParser()
+    return parser.parse_chat(chat_text)
+
+# Bump whenever the parser's output changes, so stale on-disk caches are ignored
+PARSE_CACHE_VERSION = 1
+
+def _file_digest(path):
+    # Hash in 1 MiB blocks so the export never has to sit in memory whole
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+@st.cache_data(show_spinner=False)
+def _parse_file_cached(chat_file: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    # Keyed on modification time and size rather than contents, so the file
+    # can be streamed through the parser instead of read into memory first.
+    # Across restarts the parsed frame is reused from a Parquet file next to
+    # the export, named after a hash of its contents
+    cache_dir = os.path.dirname(os.path.abspath(chat_file))
+    cache_path = os.path.join(
+        cache_dir, f'.chat_cache_v{PARSE_CACHE_VERSION}_{_file_digest(chat_file)}.parquet')
+    if os.path.exists(cache_path):
+        try:
+            # Parquet restores every dtype except the Arrow string storage
+            return pd.read_parquet(cache_path).astype({'message': 'string[pyarrow]'})
+        except Exception:
+            pass  # Unreadable cache; parse again and overwrite it
+    
+    # Undecodable bytes are replaced rather than re-reading in another encoding;
+    # utf-8-sig drops the BOM some exports start with
+    with open(chat_file, 'r', encoding='utf-8-sig', errors='replace') as f:
+        df = ChatParser().parse_chat_iter(f)
+    
+    # The cache is best-effort, e.g. the directory may be read-only
+    try:
+        df.to_parquet(cache_path, compression='zstd')
+        # Drop caches of earlier versions of the export
+        for stale in glob.glob(os.path.join(cache_dir, '.chat_cache_*.parquet')):
+            if stale != cache_path:
+                os.remove(stale)
+    except OSError:
+        pass
+    return df
+
 def load_data():
+    # Returns the parsed chat and a key identifying where it came from
     chat_file = '_chat.txt'
     if not os.path.exists(chat_file):
         st.error("⚠️ No chat data found!")
@@ -129,27 +188,77 @@ def load_data():
         st.stop()
     
     try:
-        with open(chat_file, 'r', encoding='utf-8') as f:
-            chat_text = f.read()
-    except UnicodeDecodeError:
-        try:
-            with open(chat_file, 'r', encoding='latin1') as f:
-                chat_text = f.read()
-        except Exception as e:
-            st.error(f"❌ Error reading chat file: {str(e)}")
-            st.stop()
-    except Exception as e:
+        stat = os.stat(chat_file)
+        source_key = (chat_file, stat.st_mtime_ns, stat.st_size)
+        return _parse_file_cached(*source_key), source_key
+    except OSError as e:
         st.error(f"❌ Error reading chat file: {str(e)}")
         st.stop()
-    
-    try:
-        parser = ChatParser()
-        return parser.parse_chat(chat_text)
     except Exception as e:
         st.error("❌ Error parsing chat data!")
         st.error(f"Details: {str(e)}")
         st.stop()
 
+# Most points a time-series line chart ships to the browser
+MAX_LINE_POINTS = 2000
+
+def downsample_lttb(data, x_col='date', y_col='count', n_out=MAX_LINE_POINTS):
+    # Largest-Triangle-Three-Buckets: keep first and last point, and from each
+    # bucket in between the point forming the largest triangle with the
+    # previously kept point and the next bucket's average. Preserves the
+    # visual shape (peaks included) of long series
+    n = len(data)
+    if n <= n_out:
+        return data
+    x = data[x_col].to_numpy().astype('int64')
+    x = (x - x[0]) / 1e9  # seconds from start, small enough for float math
+    y = data[y_col].to_numpy(dtype='float64')
+    buckets = np.array_split(np.arange(1, n - 1), n_out - 2)
+    keep = [0]
+    prev = 0
+    for i, bucket in enumerate(buckets):
+        nxt = buckets[i + 1] if i + 1 < len(buckets) else [n - 1]
+        avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[prev] - avg_x) * (y[bucket] - y[prev])
+                      - (x[prev] - x[bucket]) * (avg_y - y[prev]))
+        prev = bucket[area.argmax()]
+        keep.append(prev)
+    keep.append(n - 1)
+    return data.iloc[keep]
+
+# The functions below take the parsed chat as _df, which st.cache_data leaves
+# unhashed (hashing every row on each rerun would cost about as much as the
+# aggregations themselves). They are keyed on source_key instead: the digest of
+# the uploaded bytes, or the export's path, mtime and size. The cache is shared
+# by every session, so the key has to tell different chats apart
+
+@st.cache_data(show_spinner=False)
+def compute_aggregates(source_key, _df):
+    df = _df
+    # None of these depend on the selected user, so reruns triggered by the
+    # user selectbox are served from the cache
+    # Per-day/per-hour counts are bounded by the message count, so int32 is enough
+    daily_messages = downsample_lttb(df.groupby('date').size().astype('int32').reset_index(name='count'))
+    hourly_activity = df.groupby('hour').size().astype('int32').reset_index(name='count')
+    user_message_counts = df['username'].value_counts().head(10)
+    message_types = df['type'].value_counts()
+    return daily_messages, hourly_activity, user_message_counts, message_types
+
+@st.cache_data(show_spinner=False)
+def user_row_indices(source_key, _df):
+    df = _df
+    # Row positions of each user's messages from one groupby, so selecting a
+    # user takes just those rows instead of scanning the whole frame. Positions
+    # rather than sub-frames: cached values are copied out on every call
+    return df.groupby('username', sort=False, observed=True).indices
+
+@st.cache_data(show_spinner=False)
+def per_user_daily(source_key, _df):
+    df = _df
+    # Every user's daily series from one pass, so switching users is a lookup
+    return {user: downsample_lttb(user_df.groupby('date').size().astype('int32').reset_index(name='count'))
+            for user, user_df in df.groupby('username', sort=False, observed=True)}
+
 def main():
     st.title("📱 WhatsApp Chat Analysis")
     
@@ -162,24 +271,32 @@ def main():
         if uploaded_file is not None:
             # If file is uploaded, read from upload
             try:
-                chat_text = uploaded_file.getvalue().decode('utf-8')
-                parser = ChatParser()
-                df = parser.parse_chat(chat_text)
+                chat_bytes = uploaded_file.getvalue()
+                df = _parse_cached(chat_bytes)
+                source_key = hashlib.blake2b(chat_bytes, digest_size=8).hexdigest()
             except Exception as e:
                 st.error("❌ Error processing uploaded file!")
                 st.error(f"Details: {str(e)}")
                 st.stop()
         else:
             # Try loading from _chat.txt
-            df = load_data()
+            df, source_key = load_data()
         
         if df is None or df.empty:
             st.error("❌ No valid chat data found!")
             st.stop()
             
-        df['date'] = pd.to_datetime(df['timestamp']).dt.date
+        # Convert once; everything below reuses these columns. 'date' stays
+        # datetime64 (faster to group than python date objects). 'hour' is
+        # always 0-23, so 8 bits suffice; nullable so rows with an unparseable
+        # timestamp don't break the cast
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df['date'] = df['timestamp'].dt.normalize()
+        df['hour'] = df['timestamp'].dt.hour.astype('Int8')
     
     try:
+        daily_messages, hourly_activity, user_message_counts, message_types = compute_aggregates(source_key, df)
+        
         # Basic Statistics in modern cards
         st.header("📊 Chat Overview")
         metrics_container = st.container()
@@ -187,62 +304,62 @@ def main():
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
+                # Count matching rows directly instead of materializing a filtered frame
+                today_count = int((df['date'] == df['date'].max()).sum())
                 st.metric("Total Messages", f"{len(df):,}", 
-                         delta=f"+{len(df[df['date'] == df['date'].max()])} today")
+                         delta=f"+{today_count} today")
             with col2:
                 st.metric("Active Users", df['username'].nunique())
             with col3:
                 days = (df['date'].max() - df['date'].min()).days
                 st.metric("Days Active", f"{days:,}")
             with col4:
-                media_count = len(df[df['type'] == 'media'])
+                # Reuse the cached type counts that also feed the pie chart
+                media_count = int(message_types.get('media', 0))
                 st.metric("Media Shared", f"{media_count:,}")
         
         # Message Activity with modern styling
         st.header("📈 Message Trends")
-        daily_messages = df.groupby('date').size().reset_index(name='count')
+        # WebGL line traces; stable chart keys let reruns patch the existing
+        # plots instead of rebuilding them
         fig = px.line(daily_messages, x='date', y='count',
-                    title='Daily Message Volume')
+                    title='Daily Message Volume', render_mode='webgl')
         fig.update_layout(**create_modern_chart_theme())
         fig.update_traces(line=dict(color=COLORS['primary'], width=2))
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True, key="daily_messages")
         
         # User Activity Analysis with modern styling
         st.header("👥 User Engagement")
         col1, col2 = st.columns(2)
         
         with col1:
-            user_message_counts = df['username'].value_counts().head(10)
             fig = px.bar(x=user_message_counts.index, y=user_message_counts.values,
                         title='Top Contributors',
                         labels={'x': 'User', 'y': 'Messages Sent'})
             fig.update_layout(**create_modern_chart_theme())
             fig.update_traces(marker_color=COLORS['primary'])
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(fig, use_container_width=True, key="top_contributors")
         
         with col2:
-            message_types = df['type'].value_counts()
             fig = px.pie(values=message_types.values, names=message_types.index,
                         title='Message Types',
                         color_discrete_sequence=[COLORS['primary'], COLORS['secondary'], COLORS['accent']])
             fig.update_layout(**create_modern_chart_theme())
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(fig, use_container_width=True, key="message_types")
         
         # Hourly Activity Pattern with modern styling
         st.header("🕰️ Chat Patterns")
-        df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
-        hourly_activity = df.groupby('hour').size().reset_index(name='count')
         fig = px.bar(hourly_activity, x='hour', y='count',
                     title='Message Distribution by Hour',
                     labels={'hour': 'Hour of Day (24h)', 'count': 'Messages'})
         fig.update_layout(**create_modern_chart_theme())
         fig.update_traces(marker_color=COLORS['primary'])
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True, key="hourly_activity")
         
         # User Details with modern styling
         st.header("👤 User Insights")
         selected_user = st.selectbox("Select User", df['username'].unique())
-        user_df = df[df['username'] == selected_user]
+        user_df = df.take(user_row_indices(source_key, df)[selected_user])
         
         user_metrics_container = st.container()
         with user_metrics_container:
@@ -250,24 +367,24 @@ def main():
             with col1:
                 st.metric("Total Messages", f"{len(user_df):,}")
             with col2:
-                st.metric("Media Shared", f"{len(user_df[user_df['type'] == 'media']):,}")
+                st.metric("Media Shared", f"{int((user_df['type'] == 'media').sum()):,}")
             with col3:
                 st.metric("First Message", user_df['timestamp'].min().strftime('%Y-%m-%d'))
             with col4:
                 st.metric("Last Message", user_df['timestamp'].max().strftime('%Y-%m-%d'))
         
         # User's daily activity pattern
-        user_daily = user_df.groupby('date').size().reset_index(name='count')
+        user_daily = per_user_daily(source_key, df)[selected_user]
         fig = px.line(user_daily, x='date', y='count',
                     title=f"{selected_user}'s Daily Activity",
-                    labels={'count': 'Messages', 'date': 'Date'})
+                    labels={'count': 'Messages', 'date': 'Date'}, render_mode='webgl')
         fig.update_layout(
             **create_modern_chart_theme(),
             title_font_size=18,
             title_font_color=COLORS['text']
         )
         fig.update_traces(line_color=COLORS['accent'])
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True, key="user_daily")
     except Exception as e:
         st.error("❌ Error rendering visualizations!")
         st.error(f"Details: {str(e)}")
@@ -1,20 +1,82 @@
 import re
 from datetime import datetime
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 import logging
 
+# Timestamp formats seen in WhatsApp exports, tried in order
+TIMESTAMP_FORMATS = [
+    '%m/%d/%y, %I:%M %p',
+    '%m/%d/%Y, %I:%M %p',
+    '%m/%d/%y, %I:%M:%S %p',
+    '%m/%d/%Y, %I:%M:%S %p',
+]
+
+# Field order of the raw per-message records built while parsing
+RECORD_COLUMNS = ['ts_str', 'username', 'message', 'type']
+
+# A gap longer than this between messages starts a new conversation (1 hour, in ns)
+CONVERSATION_GAP_NS = 3600 * 10**9
+
+# Invisible control characters U+200B..U+200F (zero-width chars, LTR/RTL marks).
+# Deliberately not a raw string: the pattern holds the characters themselves,
+# which both Python's re and the RE2 engine behind Arrow string kernels accept
+_ZW_CHARS = '[\u200b-\u200f]'
+_ZW_RE = re.compile(_ZW_CHARS)
+
+# Substrings marking media placeholders and group notifications
+MEDIA_MARKERS = ['sticker omitted', 'image omitted', 'audio omitted', 'video omitted', 'Contact card omitted']
+SYSTEM_MARKERS = [
+    'Messages and calls are end-to-end encrypted',
+    'created this group',
+    'added',
+    'left',
+    'removed',
+    'changed the subject',
+    'changed this group\'s icon',
+    'deleted this message'
+]
+
+# Header building blocks. Digits are spelled [0-9] rather than \d so they never
+# need Unicode digit lookups. re.ASCII is not an option for these patterns:
+# newer exports put U+202F (narrow no-break space) before AM/PM, which only
+# Unicode-aware whitespace matches. [^\S\n] is whitespace that stays on one line
+_DATE = r'[0-9]{1,2}/[0-9]{1,2}/[0-9]{2,4}'
+_TIME = r'[0-9]{1,2}:[0-9]{2}(?::[0-9]{2})?[^\S\n]*[APMapm]{2}'
+
+# Start of a line that begins a new message (header followed by some text)
+_NEXT_HEADER = rf'[^\S\n]*\[{_DATE},[^\S\n]*{_TIME}\][^\S\n]*\S'
+
+# Core message pattern - handles Unicode characters and emojis. Matches a whole
+# message: header, optional "username:" (missing for system messages and group
+# notifications), then the body. Blank space after the colon may run onto the
+# following lines, but never into the next message. The body is taken a line at
+# a time and stops before the next line that starts a message, so continuation
+# lines are absorbed without checking a lookahead at every character
+_MSG_RE = re.compile(
+    rf'^[^\S\n]*\[({_DATE}),[^\S\n]*({_TIME})\][^\S\n]*'
+    rf'(?:([^:\n]+):(?:[^\S\n]|\n(?!{_NEXT_HEADER}))*)?'
+    rf'(\S[^\n]*(?:\n(?!{_NEXT_HEADER})[^\n]*)*)',
+    re.MULTILINE
+)
+
+# Same header on a single (stripped) line, for line-by-line parsing
+_LINE_RE = re.compile(rf'^\[({_DATE}),\s*({_TIME})\]\s*(?:([^:]+):\s*)?(.+)$')
+
+# Line breaks inside a message (plus surrounding blanks) collapse to one space
+_LINE_BREAK_RE = re.compile(r'\s*\n\s*')
+
+# Mention tags in usernames; WhatsApp writes them with ASCII digits only
+_MENTION_RE = re.compile(r'@\d+', re.ASCII)
+
+# Markers compiled into single alternations, so detecting a type is one regex
+# scan instead of a substring search per marker
+_MEDIA_RE = re.compile('|'.join(map(re.escape, MEDIA_MARKERS)))
+_SYSTEM_RE = re.compile('|'.join(map(re.escape, SYSTEM_MARKERS)))
+
 class ChatParser:
     def __init__(self):
-        # Core message pattern - handles Unicode characters and emojis
-        self.message_pattern = r'^\[(\d{1,2}/\d{1,2}/\d{2,4}),\s*(\d{1,2}:\d{2}(?::\d{2})?\s*[APMapm]{2})\]\s*([^:]+):\s*(.+)$'
-        
-        # Special message patterns (for system messages and group notifications)
-        self.system_msg_pattern = r'^\[(\d{1,2}/\d{1,2}/\d{2,4}),\s*(\d{1,2}:\d{2}(?::\d{2})?\s*[APMapm]{2})\]\s*(.+)$'
-        
-        # Track conversation contexts
-        self.conversations = []
-        
         # Set up logging
         logging.basicConfig(filename='chat_parser.log', 
                           level=logging.INFO,
@@ -22,14 +84,8 @@ class ChatParser:
 
     def parse_timestamp(self, date_str: str, time_str: str) -> Optional[datetime]:
         """Convert timestamp string to datetime object"""
-        formats = [
-            '%m/%d/%y, %I:%M %p',
-            '%m/%d/%Y, %I:%M %p',
-            '%m/%d/%y, %I:%M:%S %p',
-            '%m/%d/%Y, %I:%M:%S %p',
-        ]
         ts_str = f"{date_str}, {time_str}"
-        for fmt in formats:
+        for fmt in TIMESTAMP_FORMATS:
             try:
                 return datetime.strptime(ts_str, fmt)
             except ValueError:
@@ -37,130 +93,157 @@ class ChatParser:
         logging.error(f"Failed to parse timestamp: {ts_str}")
         return None
 
+    def parse_timestamps(self, ts_strs: pd.Series) -> pd.Series:
+        """Convert a column of timestamp strings, one vectorized pass per format"""
+        timestamps = pd.Series(pd.NaT, index=ts_strs.index, dtype='datetime64[ns]')
+        remaining = ts_strs
+        for fmt in TIMESTAMP_FORMATS:
+            if remaining.empty:
+                break
+            # cache=True converts each distinct string only once
+            parsed = pd.to_datetime(remaining, format=fmt, errors='coerce', cache=True)
+            matched = parsed.notna()
+            timestamps.loc[matched.index[matched]] = parsed[matched]
+            remaining = remaining[~matched]
+        for ts_str in remaining:
+            logging.error(f"Failed to parse timestamp: {ts_str}")
+        return timestamps
+
     def clean_username(self, username: str) -> str:
         """Standardize username format"""
-        username = re.sub(r'@\d+', '', username)
+        username = _MENTION_RE.sub('', username)
         return username.strip()
 
     def clean_message(self, message: str) -> str:
         """Remove control characters while preserving emojis and meaningful content"""
-        # Remove Left-to-Right Mark and other control characters
-        message = message.replace('\u200e', '')  # Remove LTR mark
-        message = message.replace('\u200f', '')  # Remove RTL mark
-        # Remove other invisible control characters in range U+200B to U+200F
-        message = re.sub(r'[\u200b-\u200f]', '', message)
+        # Remove LTR/RTL marks and other invisible control characters
+        # (U+200B to U+200F) in a single pass; ASCII text can't contain any
+        if not message.isascii():
+            message = _ZW_RE.sub('', message)
         return message.strip()
 
     def detect_message_type(self, message: str) -> str:
         """Detect if message contains media or is system message"""
-        media_markers = ['sticker omitted', 'image omitted', 'audio omitted', 'video omitted', 'Contact card omitted']
-        system_markers = [
-            'Messages and calls are end-to-end encrypted',
-            'created this group',
-            'added',
-            'left',
-            'removed',
-            'changed the subject',
-            'changed this group\'s icon',
-            'deleted this message'
-        ]
-        if any(marker in message for marker in media_markers):
+        if _MEDIA_RE.search(message):
             return 'media'
-        if any(marker in message for marker in system_markers):
+        if _SYSTEM_RE.search(message):
             return 'system'
         return 'text'
 
+    def _record_from_match(self, match: re.Match, message: Optional[str] = None) -> tuple:
+        """Build a raw (uncleaned) record tuple (see RECORD_COLUMNS) from a pattern match"""
+        date_str, time_str, username, body = match.groups()
+        if message is None:
+            message = body
+        if username is None:
+            return (f"{date_str}, {time_str}", 'SYSTEM', message, 'system')
+        return (f"{date_str}, {time_str}", username, message, None)
+
+    def _record_from_lines(self, header: re.Match, parts: List[str]) -> tuple:
+        """Build a raw record from a header line match and the message's lines"""
+        if header.group(3) is None and len(parts) > 1:
+            # "Name:" with the text starting on the next line only shows up as
+            # a user message once the lines are joined. Re-match with the
+            # whole-message pattern on newline-joined lines, exactly as
+            # parse_chat sees them, so a username never spans a line break
+            header = _MSG_RE.match('\n'.join([header.group(0), *parts[1:]]))
+            return self._record_from_match(header)
+        return self._record_from_match(header, ' '.join(parts))
+
     def extract_message(self, line: str) -> Optional[Dict]:
         """Extract structured data from a chat line"""
-        # Try normal message pattern
-        match = re.match(self.message_pattern, line)
-        if match:
-            date_str, time_str, username, message = match.groups()
-            message = self.clean_message(message)
-            return {
-                'timestamp': self.parse_timestamp(date_str, time_str),
-                'username': self.clean_username(username),
-                'message': message,
-                'type': self.detect_message_type(message)
-            }
-        
-        # Try system message pattern
-        match = re.match(self.system_msg_pattern, line)
-        if match:
-            date_str, time_str, message = match.groups()
-            message = self.clean_message(message)
-            return {
-                'timestamp': self.parse_timestamp(date_str, time_str),
-                'username': 'SYSTEM',
-                'message': message,
-                'type': 'system'
-            }
-            
-        return None
-
-    def detect_conversation_break(self, current_msg: Dict, prev_msg: Optional[Dict]) -> bool:
-        """Detect if this message starts a new conversation"""
-        if not prev_msg or not prev_msg['timestamp'] or not current_msg['timestamp']:
-            return True
-            
-        # Time gap > 1 hour suggests new conversation
-        time_gap = current_msg['timestamp'] - prev_msg['timestamp']
-        if time_gap.total_seconds() > 3600:
-            return True
-            
-        return False
+        match = _MSG_RE.match(line)
+        if not match:
+            return None
+        ts_str, username, message, msg_type = self._record_from_match(match)
+        message = self.clean_message(_LINE_BREAK_RE.sub(' ', message))
+        if msg_type is None:
+            username = self.clean_username(username)
+            msg_type = self.detect_message_type(message)
+        return {
+            'ts_str': ts_str,
+            'username': username,
+            'message': message,
+            'type': msg_type
+        }
 
     def parse_chat(self, text: str) -> pd.DataFrame:
         """Parse entire chat log into structured format"""
+        # Cleaning and type detection happen per column below
+        messages = [self._record_from_match(match) for match in _MSG_RE.finditer(text)]
+        return self._build_frame(messages)
+
+    def parse_chat_iter(self, lines: Iterable[str]) -> pd.DataFrame:
+        """Parse a chat log streamed line by line, e.g. straight from an open file"""
         messages = []
-        prev_msg = None
-        buffer = ''
-        conversation_id = -1  # Start from -1 so first increment gives 0
+        header = None
+        parts = []  # Message text followed by its continuation lines
 
-        lines = text.split('\n')
         for line in lines:
             line = line.strip()
             if not line:
                 continue
 
-            # Check if line is the start of a new message
-            if re.match(self.message_pattern, line) or re.match(self.system_msg_pattern, line):
-                # Process the previous buffered message
-                if buffer:
-                    msg = self.extract_message(buffer)
-                    if msg:
-                        # Check for conversation breaks
-                        if self.detect_conversation_break(msg, prev_msg):
-                            conversation_id += 1
-                            self.conversations.append([])
-                        msg['conversation_id'] = conversation_id
-                        self.conversations[-1].append(msg)
-                        messages.append(msg)
-                        prev_msg = msg
-                buffer = line  # Start buffering the new message
-            else:
+            match = _LINE_RE.match(line)
+            if match:
+                # Flush the previous message before starting the new one
+                if header:
+                    messages.append(self._record_from_lines(header, parts))
+                header = match
+                parts = [match.group(4)]
+            elif header:
                 # Continuation of the previous message
-                buffer += f' {line}'
-
-        # Process the last buffered message
-        if buffer:
-            msg = self.extract_message(buffer)
-            if msg:
-                if self.detect_conversation_break(msg, prev_msg):
-                    conversation_id += 1
-                    self.conversations.append([])
-                msg['conversation_id'] = conversation_id
-                self.conversations[-1].append(msg)
-                messages.append(msg)
-
-        # Create DataFrame
-        df = pd.DataFrame(messages)
+                parts.append(line)
+
+        if header:
+            messages.append(self._record_from_lines(header, parts))
+
+        return self._build_frame(messages)
+
+    def _build_frame(self, messages: List[tuple]) -> pd.DataFrame:
+        """Turn raw message records into the cleaned, typed DataFrame"""
+        # Create DataFrame; plain tuples avoid building and key-matching a
+        # dict per message
+        df = pd.DataFrame.from_records(messages, columns=RECORD_COLUMNS)
         if not df.empty:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            df.insert(0, 'timestamp', self.parse_timestamps(df.pop('ts_str')))
             df['username'] = df['username'].fillna('UNKNOWN')
-            df['message'] = df['message'].fillna('')
-            df['type'] = df['type'].fillna('text')
-            df['conversation_id'] = df['conversation_id'].fillna(0).astype(int)
+            # Messages are stored Arrow-backed: one compact buffer instead of a
+            # Python object per row, and the string ops below run as Arrow
+            # compute kernels instead of a Python-level loop
+            df['message'] = df['message'].fillna('').astype('string[pyarrow]')
+            # Clean whole columns at once rather than calling clean_message /
+            # clean_username per row; line breaks inside a message become spaces.
+            # Patterns are passed as strings so Arrow can evaluate them itself
+            df['message'] = (df['message']
+                             .str.replace(_LINE_BREAK_RE.pattern, ' ', regex=True)
+                             .str.replace(_ZW_CHARS, '', regex=True)
+                             .str.strip())
+            df['username'] = df['username'].str.replace(_MENTION_RE, '', regex=True).str.strip()
+            # Media is checked before system markers, as in detect_message_type
+            df['type'] = np.select(
+                [df['type'].eq('system'),
+                 df['message'].str.contains(_MEDIA_RE.pattern),
+                 df['message'].str.contains(_SYSTEM_RE.pattern)],
+                ['system', 'media', 'system'],
+                default='text'
+            )
+            # Time gap > 1 hour (or a missing timestamp) suggests new conversation;
+            # computed on the raw int64 nanoseconds in one pass
+            ts = df['timestamp'].to_numpy().view('int64')
+            missing = np.isnat(df['timestamp'].to_numpy())
+            breaks = np.empty(len(ts), dtype=bool)
+            breaks[0] = True
+            np.greater(np.diff(ts), CONVERSATION_GAP_NS, out=breaks[1:])
+            breaks[1:] |= missing[1:] | missing[:-1]
+            # int32 is plenty: there are never more conversations than messages,
+            # and a chat export is nowhere near 2**31 messages
+            df['conversation_id'] = (np.cumsum(breaks) - 1).astype('int32')
+            # Few distinct values repeated on every row: store as small integer
+            # codes. Only ever group on one of these at a time, since multi-key
+            # groupbys over several categoricals build the full cartesian product
+            df['username'] = df['username'].astype('category')
+            df['type'] = df['type'].astype(pd.CategoricalDtype(categories=['text', 'media', 'system']))
         else:
             df = pd.DataFrame(columns=['timestamp', 'username', 'message', 'type', 'conversation_id'])
 
@@ -168,16 +251,20 @@ class ChatParser:
 
     def get_user_statistics(self, df: pd.DataFrame) -> Dict:
         """Calculate per-user statistics"""
-        stats = {}
-        for user in df['username'].unique():
-            user_msgs = df[df['username'] == user]
-            if user_msgs.empty:
-                continue
-            stats[user] = {
-                'message_count': len(user_msgs),
-                'avg_message_length': user_msgs['message'].str.len().mean(),
-                'most_active_hour': user_msgs['timestamp'].dt.hour.mode().iloc[0] if not user_msgs['timestamp'].dt.hour.mode().empty else None,
-                'first_message': user_msgs['timestamp'].min(),
-                'last_message': user_msgs['timestamp'].max()
-            }
-        return stats
+        if df.empty:
+            return {}
+        df2 = df.assign(msg_len=df['message'].str.len(), hour=df['timestamp'].dt.hour)
+        grp = df2.groupby('username', sort=False, observed=True)
+        # Most frequent hour per user; counts are sorted by hour, so idxmax picks
+        # the earliest hour on ties, same as mode().iloc[0]
+        hour_counts = df2.groupby(['username', 'hour'], observed=True).size()
+        most_active_hour = hour_counts.groupby(level=0, observed=True).idxmax().str[1]
+        message_count = grp.size()
+        stats = pd.DataFrame({
+            'message_count': message_count,
+            'avg_message_length': grp['msg_len'].mean(),
+            'most_active_hour': most_active_hour,
+            'first_message': grp['timestamp'].min(),
+            'last_message': grp['timestamp'].max()
+        }, index=message_count.index)  # Keep users in order of first appearance
+        return stats.to_dict('index')
@@ -1,26 +1,21 @@
 from chat_parser import ChatParser
+from itertools import islice
 import sys
 
 # Set console encoding to UTF-8
 sys.stdout.reconfigure(encoding='utf-8')
 
-# Read chat file
-try:
-    with open('_chat.txt', 'r', encoding='utf-8') as f:
-        chat_text = f.read()
-except UnicodeDecodeError:
-    # Try with a different encoding if UTF-8 fails
-    with open('_chat.txt', 'r', encoding='latin1') as f:
-        chat_text = f.read()
-
-# Save first few lines to a file
-with open('chat_preview.txt', 'w', encoding='utf-8') as f:
-    f.write("\nFirst few lines of chat_text:\n")
-    f.write("\n".join(chat_text.split('\n')[:5]))
-
-# Parse
+# Parse, streaming the chat file instead of reading it into one string.
+# Undecodable bytes are replaced rather than re-reading in another encoding;
+# utf-8-sig drops the BOM some exports start with
 parser = ChatParser()
-df = parser.parse_chat(chat_text)
+with open('_chat.txt', 'r', encoding='utf-8-sig', errors='replace') as chat_file:
+    # Save first few lines to a file
+    with open('chat_preview.txt', 'w', encoding='utf-8') as f:
+        f.write("\nFirst few lines of chat_text:\n")
+        f.write(''.join(islice(chat_file, 5)).rstrip('\n'))
+    chat_file.seek(0)
+    df = parser.parse_chat_iter(chat_file)
 
 # Save debug info to a file
 with open('debug_info.txt', 'w', encoding='utf-8') as f:
@@ -30,8 +25,8 @@ with open('debug_info.txt', 'w', encoding='utf-8') as f:
     f.write(df.head().to_string())
     f.write(f"\nShape: {df.shape}\n")
 
-# Save results
-df.to_csv('parsed_chat.csv', index=False, encoding='utf-8')
+# Save results; Parquet keeps the parsed dtypes, so reloading needs no parsing
+df.to_parquet('parsed_chat.parquet', index=False, compression='zstd')
 
 # Save statistics to a file
 with open('user_statistics.txt', 'w', encoding='utf-8') as f:
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+from chat_parser import ChatParser
+
+# Both entry points must agree: uploads go through parse_chat, _chat.txt
+# through parse_chat_iter
+CHATS = [
+    # Multi-line system message whose continuation contains a colon
+    "[1/2/20, 1:00 PM] Alice changed the group description\nRules: be nice\n"
+    "[1/2/20, 1:01 PM] Bob: ok",
+    # "Name:" with the text starting on the next line
+    "[1/2/20, 1:00 PM] Fay:\n  body on next line\n[1/2/20, 1:02 PM] Bob added Carol",
+    # Empty "Name:" directly followed by the next message
+    "[1/2/20, 1:00 PM] Alice:\n[1/2/20, 1:01 PM] Bob: hi",
+    # Continuations that look like headers, CRLF line endings
+    "[1/2/20, 1:00 PM] Eve: first\r\n[2] not a header\r\n[1/2/20, 1:03 PM]\r\n"
+    "[1/2/20, 1:04 PM] Dan: last\r\n",
+]
+
+
+@pytest.mark.parametrize('chat', CHATS)
+def test_parse_chat_and_parse_chat_iter_agree(chat):
+    parser = ChatParser()
+    pd.testing.assert_frame_equal(parser.parse_chat(chat),
+                                  parser.parse_chat_iter(chat.split('\n')))
+
+
+def test_multiline_system_message_stays_system():
+    df = ChatParser().parse_chat_iter(CHATS[0].split('\n'))
+    assert df['username'].tolist() == ['SYSTEM', 'Bob']
+    assert df['message'].iloc[0] == 'Alice changed the group description Rules: be nice'
+    assert df['type'].iloc[0] == 'system'